@@ -1,8 +1,18 @@
 from flask import Flask, render_template, request, redirect, jsonify
 from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime, timedelta
-from collections import defaultdict
+from flask_caching import Cache
+from sqlalchemy import event, exists, func, insert, inspect, select, text
+from sqlalchemy.orm import load_only, raiseload
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from jinja2 import FileSystemBytecodeCache
+import hashlib
+import numpy as np
 import os
+import tempfile
 
 app = Flask(__name__)
 
@@ -10,7 +20,44 @@ app = Flask(__name__)
 app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///health_journal.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
+# Connection pooling: keep warm connections alive across requests instead of
+# opening and tearing one down per request under concurrent gunicorn workers.
+# SQLite connections are cheap local file handles, so only pre-ping applies there.
+if app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'pool_pre_ping': True}
+else:
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        'pool_size': 10,
+        'max_overflow': 20,
+        'pool_timeout': 30,
+        'pool_recycle': 3600,
+        'pool_pre_ping': True
+    }
+
+# Persist compiled templates across processes and skip per-request source
+# staleness checks outside debug mode, so rendering starts from a hash lookup
+_jinja_cache_dir = os.path.join(tempfile.gettempdir(), 'health_journal_jinja_cache')
+os.makedirs(_jinja_cache_dir, exist_ok=True)
+app.jinja_env.bytecode_cache = FileSystemBytecodeCache(_jinja_cache_dir)
+app.jinja_env.cache_size = 400
+if not app.debug:
+    app.jinja_env.auto_reload = False
+
 db = SQLAlchemy(app)
+cache = Cache(app, config={'CACHE_TYPE': 'SimpleCache'})
+
+# SQLite tuning: WAL lets readers proceed during writes and NORMAL sync
+# halves the fsync cost of each commit
+with app.app_context():
+    if db.engine.dialect.name == 'sqlite':
+        @event.listens_for(db.engine, 'connect')
+        def _set_sqlite_pragmas(dbapi_conn, conn_record):
+            cur = dbapi_conn.cursor()
+            cur.execute("PRAGMA journal_mode=WAL")
+            cur.execute("PRAGMA synchronous=NORMAL")
+            cur.execute("PRAGMA mmap_size=268435456")
+            cur.execute("PRAGMA temp_store=MEMORY")
+            cur.close()
 
 # Database Models
 class UserProfile(db.Model):
@@ -28,7 +75,8 @@ class DailyLog(db.Model):
     __tablename__ = 'daily_logs'
     
     id = db.Column(db.Integer, primary_key=True)
-    date = db.Column(db.Date, nullable=False, index=True)
+    date = db.Column(db.Date, nullable=False, unique=True, index=True)
+    week_start = db.Column(db.Date, index=True)  # Monday of the week, set at write time
     weight = db.Column(db.Float, nullable=False)  # kg
     walk_km = db.Column(db.Float, default=0)
     consumed_calories = db.Column(db.Float, default=0)
@@ -39,6 +87,10 @@ class DailyLog(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    # Matches the ORDER BY date DESC on the home page so the listing is
+    # served straight from the index
+    __table_args__ = (db.Index('ix_daily_logs_date_desc', date.desc()),)
+
 class BodyFatHistory(db.Model):
     __tablename__ = 'body_fat_history'
     
@@ -46,71 +98,211 @@ class BodyFatHistory(db.Model):
     body_fat = db.Column(db.Float, nullable=False)
     recorded_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
 
+    # Serves the ORDER BY recorded_at DESC LIMIT 10 on the home page
+    __table_args__ = (db.Index('ix_bf_recorded_at_desc', recorded_at.desc()),)
+
 # Initialize database
+def _upgrade_schema(insp):
+    """Apply the additive schema changes newer code expects to a database
+    created by an older version; the repo carries no migration tooling."""
+    if not insp.has_table('daily_logs'):
+        db.create_all()
+        return
+
+    columns = {col['name'] for col in insp.get_columns('daily_logs')}
+    if 'week_start' not in columns:
+        db.session.execute(text('ALTER TABLE daily_logs ADD COLUMN week_start DATE'))
+        db.session.commit()
+
+    # The /log upsert's ON CONFLICT needs date to be unique; old databases
+    # carry a plain index under the same name, so swap it for the unique one
+    indexes = {ix['name']: ix for ix in insp.get_indexes('daily_logs')}
+    date_index = indexes.get('ix_daily_logs_date')
+    if date_index is not None and not date_index['unique']:
+        db.session.execute(text('DROP INDEX ix_daily_logs_date'))
+        db.session.commit()
+
+    # Create any indexes added since the database was built
+    for table in db.metadata.tables.values():
+        for index in table.indexes:
+            index.create(bind=db.engine, checkfirst=True)
+
 def init_db():
     with app.app_context():
-        db.create_all()
+        insp = inspect(db.engine)
+        if not insp.has_table('user_profile'):
+            # Fresh database; skipped on hot worker starts
+            db.create_all()
+        else:
+            _upgrade_schema(insp)
+        # Backfill week_start for rows written before the column existed
+        for log in DailyLog.query.filter(DailyLog.week_start.is_(None)).all():
+            log.week_start = log.date - timedelta(days=log.date.weekday())
+        db.session.commit()
+
+@app.cli.command('init-db')
+def init_db_command():
+    """Create any missing tables and backfill derived columns"""
+    init_db()
+    print('Initialized the database.')
 
 # Helper Functions
 def get_user_profile():
     return UserProfile.query.first()
 
+def user_exists():
+    """Existence probe that avoids hydrating the profile row"""
+    return bool(db.session.scalar(select(exists(select(UserProfile.id)))))
+
+def _to_float(value, default=0.0):
+    """Coerce a form value to float, falling back for missing/empty fields"""
+    return float(value) if value else default
+
+def record_body_fat(body_fat):
+    """Queue a history entry unless it matches the latest recorded value"""
+    last = db.session.scalar(
+        select(BodyFatHistory.body_fat)
+        .order_by(BodyFatHistory.recorded_at.desc())
+        .limit(1)
+    )
+    if last != body_fat:
+        db.session.add(BodyFatHistory(body_fat=body_fat))
+
+def strict_load_options():
+    """In debug mode, make any unplanned lazy load raise instead of silently
+    issuing an N+1 query. A no-op while the models have no relationships;
+    once they grow some, routes must load them explicitly."""
+    return (raiseload('*'),) if app.debug else ()
+
+def _katch_mcardle(weight, body_fat):
+    """Katch-McArdle BMR expression; works on scalars and NumPy arrays alike"""
+    lbm = weight * (1 - (body_fat / 100))
+    return 370 + (21.6 * lbm)
+
+@lru_cache(maxsize=256)
 def calculate_katch_mcardle_bmr(weight, body_fat):
     """Calculate BMR using Katch-McArdle formula"""
     if weight is None or body_fat is None:
         return None
-    lbm = weight * (1 - (body_fat / 100))
-    bmr = 370 + (21.6 * lbm)
-    return round(bmr, 0)
+    return round(_katch_mcardle(weight, body_fat), 0)
+
+def compute_metrics(weight, body_fat, walk_km, consumed, burnt):
+    """Compute total_burn, deficit and fat_loss_g for one entry or a batch.
+
+    Accepts scalars or array-likes; the arithmetic runs on NumPy arrays so
+    a batch import pays one vectorized pass instead of a Python loop per row."""
+    weight = np.asarray(weight, dtype=np.float64)
+    walk_km = np.asarray(walk_km, dtype=np.float64)
+    consumed = np.asarray(consumed, dtype=np.float64)
+    burnt = np.asarray(burnt, dtype=np.float64)
+
+    bmr = np.round(_katch_mcardle(weight, body_fat), 0)
+    total_burn = bmr + (walk_km * 60) + burnt
+    deficit = total_burn - consumed
+    fat_loss_g = np.where(deficit > 0, (deficit / 7700) * 1000, 0)
+    return np.round(total_burn, 0), np.round(deficit, 0), np.round(fat_loss_g, 2)
 
+def bulk_log(rows):
+    """Insert many daily log rows (e.g. a CSV import) in one executemany.
+
+    Each row is a dict of DailyLog column values with the derived metrics
+    already computed. Goes through Core insert, skipping per-object ORM
+    bookkeeping that would dominate at batch sizes."""
+    db.session.execute(insert(DailyLog), rows)
+    db.session.commit()
+    cache.delete_memoized(get_weekly_summary)
+
+@cache.memoize(timeout=300)
 def get_weekly_summary():
-    """Calculate weekly summaries from database"""
-    logs = DailyLog.query.all()
-    weekly = defaultdict(lambda: {"total_burn": 0, "consumed": 0, "deficit": 0, "fat_loss": 0, "days": 0})
-    
-    for log in logs:
-        week_key = (log.date - timedelta(days=log.date.weekday())).strftime('%Y-%m-%d')
-        weekly[week_key]["total_burn"] += log.total_burn or 0
-        weekly[week_key]["consumed"] += log.consumed_calories or 0
-        weekly[week_key]["deficit"] += log.deficit or 0
-        weekly[week_key]["fat_loss"] += log.fat_loss_g or 0
-        weekly[week_key]["days"] += 1
-    
-    return weekly
+    """Calculate weekly summaries with a single grouped query in the database"""
+    rows = db.session.query(
+        DailyLog.week_start,
+        func.sum(DailyLog.total_burn),
+        func.sum(DailyLog.consumed_calories),
+        func.sum(DailyLog.deficit),
+        func.sum(DailyLog.fat_loss_g),
+        func.count()
+    ).group_by(DailyLog.week_start).order_by(DailyLog.week_start).all()
+
+    return {
+        week_start: {
+            "total_burn": total_burn or 0,
+            "consumed": consumed or 0,
+            "deficit": deficit or 0,
+            "fat_loss": fat_loss or 0,
+            "days": days
+        }
+        for week_start, total_burn, consumed, deficit, fat_loss, days in rows
+    }
 
 # Routes
 @app.route('/')
 def home():
-    user = get_user_profile()
-    
-    if not user:
+    # A bare EXISTS answers the setup branch without touching any columns
+    if not user_exists():
         return render_template('index.html', setup_needed=True)
-    
+
+    # The weekly summary and body-fat history are fetched client-side from
+    # /summary.json, so this render only needs the profile and the logs table
+    user = get_user_profile()
     bmr = calculate_katch_mcardle_bmr(user.weight, user.body_fat)
-    logs = DailyLog.query.order_by(DailyLog.date.desc()).all()
-    weekly = get_weekly_summary()
-    body_fat_history = BodyFatHistory.query.order_by(BodyFatHistory.recorded_at.desc()).limit(10).all()
-    today = datetime.now().strftime('%Y-%m-%d')
-    
+    # Only the columns the template renders; skips created_at/updated_at
+    logs = DailyLog.query.options(load_only(
+        DailyLog.date, DailyLog.weight, DailyLog.walk_km,
+        DailyLog.consumed_calories, DailyLog.exercise_burnt,
+        DailyLog.total_burn, DailyLog.deficit, DailyLog.fat_loss_g
+    ), *strict_load_options()).order_by(DailyLog.date.desc()).all()
+    today = date.today().isoformat()
+
     return render_template(
         'index.html',
         user=user,
         bmr=bmr,
         logs=logs,
-        weekly=weekly,
-        body_fat_history=body_fat_history,
         setup_needed=False,
         today=today
     )
 
+@app.route('/summary.json')
+def summary_json():
+    """Read-only summaries as a cacheable fragment for client-side fetches"""
+    last_log = db.session.query(func.max(DailyLog.updated_at)).scalar()
+    last_bf = db.session.query(func.max(BodyFatHistory.recorded_at)).scalar()
+    etag = hashlib.md5(f'{last_log}:{last_bf}'.encode()).hexdigest()
+
+    # Skip building the payload entirely when the client copy is current
+    if etag in request.if_none_match:
+        response = app.response_class(status=304)
+        response.set_etag(etag)
+        response.cache_control.max_age = 60
+        return response
+
+    history = db.session.execute(
+        select(BodyFatHistory.body_fat, BodyFatHistory.recorded_at)
+        .order_by(BodyFatHistory.recorded_at.desc())
+        .limit(10)
+    ).all()
+
+    response = jsonify({
+        'weekly': {str(week): summary for week, summary in get_weekly_summary().items()},
+        'history': [
+            {'body_fat': body_fat, 'recorded_at': recorded_at.isoformat()}
+            for body_fat, recorded_at in history
+        ]
+    })
+    response.set_etag(etag)
+    response.cache_control.max_age = 60
+    return response
+
 @app.route('/setup', methods=['POST'])
 def setup_profile():
     try:
-        height = float(request.form.get('height'))
-        weight = float(request.form.get('weight'))
-        body_fat = float(request.form.get('body_fat'))
-        age = int(request.form.get('age'))
-        gender = request.form.get('gender')
+        form = request.form.to_dict()
+        height = float(form.get('height'))
+        weight = float(form.get('weight'))
+        body_fat = float(form.get('body_fat'))
+        age = int(form.get('age'))
+        gender = form.get('gender')
         
         # Check if user profile already exists
         user = UserProfile.query.first()
@@ -125,10 +317,11 @@ def setup_profile():
             db.session.add(user)
         
         # Log the initial body fat
-        body_fat_entry = BodyFatHistory(body_fat=body_fat)
-        db.session.add(body_fat_entry)
-        
+        record_body_fat(body_fat)
+
         db.session.commit()
+        calculate_katch_mcardle_bmr.cache_clear()
+        cache.delete_memoized(get_weekly_summary)
     except (ValueError, TypeError) as e:
         print(f"Error in setup: {e}")
     
@@ -141,43 +334,43 @@ def log_data():
         return redirect('/')
     
     try:
-        log_date = request.form.get('date', datetime.now().strftime('%Y-%m-%d'))
-        log_date = datetime.strptime(log_date, '%Y-%m-%d').date()
-        weight = float(request.form.get('weight', user.weight))
-        walk_km = float(request.form.get('walk', 0))
-        consumed = float(request.form.get('consumed', 0))
-        burnt = float(request.form.get('burnt', 0))
-        
-        bmr = calculate_katch_mcardle_bmr(weight, user.body_fat)
-        total_burn = bmr + (walk_km * 60) + burnt
-        deficit = total_burn - consumed
-        fat_loss_g = (deficit / 7700) * 1000 if deficit > 0 else 0
-        
-        # Check if log for this date exists
-        existing_log = DailyLog.query.filter_by(date=log_date).first()
-        if existing_log:
-            existing_log.weight = weight
-            existing_log.walk_km = walk_km
-            existing_log.consumed_calories = consumed
-            existing_log.exercise_burnt = burnt
-            existing_log.total_burn = round(total_burn, 0)
-            existing_log.deficit = round(deficit, 0)
-            existing_log.fat_loss_g = round(fat_loss_g, 2)
-        else:
-            log = DailyLog(
-                date=log_date,
-                weight=weight,
-                walk_km=walk_km,
-                consumed_calories=consumed,
-                exercise_burnt=burnt,
-                total_burn=round(total_burn, 0),
-                deficit=round(deficit, 0),
-                fat_loss_g=round(fat_loss_g, 2)
-            )
-            db.session.add(log)
+        # One pass over the form instead of a MultiDict walk per field
+        form = request.form.to_dict()
+        raw_date = form.get('date')
+        log_date = date.fromisoformat(raw_date) if raw_date else date.today()
+        weight = _to_float(form.get('weight'), user.weight)
+        walk_km = _to_float(form.get('walk'))
+        consumed = _to_float(form.get('consumed'))
+        burnt = _to_float(form.get('burnt'))
         
+        total_burn, deficit, fat_loss_g = compute_metrics(
+            weight, user.body_fat, walk_km, consumed, burnt
+        )
+
+        # Single-statement upsert on date instead of SELECT-then-UPDATE
+        values = dict(
+            date=log_date,
+            week_start=log_date - timedelta(days=log_date.weekday()),
+            weight=weight,
+            walk_km=walk_km,
+            consumed_calories=consumed,
+            exercise_burnt=burnt,
+            total_burn=float(total_burn),
+            deficit=float(deficit),
+            fat_loss_g=float(fat_loss_g)
+        )
+        insert_stmt = sqlite_insert if db.engine.dialect.name == 'sqlite' else pg_insert
+        updates = {k: v for k, v in values.items() if k != 'date'}
+        updates['updated_at'] = datetime.utcnow()
+        stmt = insert_stmt(DailyLog).values(**values).on_conflict_do_update(
+            index_elements=['date'], set_=updates
+        )
+        db.session.execute(stmt)
+
         db.session.commit()
-    except (ValueError, TypeError) as e:
+        cache.delete_memoized(get_weekly_summary)
+    except (ValueError, TypeError, SQLAlchemyError) as e:
+        db.session.rollback()
         print(f"Error logging data: {e}")
     
     return redirect('/')
@@ -193,14 +386,17 @@ def update_body_fat():
         user.body_fat = new_body_fat
         
         # Log the body fat change
-        body_fat_entry = BodyFatHistory(body_fat=new_body_fat)
-        db.session.add(body_fat_entry)
+        record_body_fat(new_body_fat)
         db.session.commit()
+        calculate_katch_mcardle_bmr.cache_clear()
     except (ValueError, TypeError) as e:
         print(f"Error updating body fat: {e}")
     
     return redirect('/')
 
+# Runs once per process at import so gunicorn workers get a ready schema too;
+# the has_table gate keeps recycled-worker boots cheap
+init_db()
+
 if __name__ == '__main__':
-    init_db()
     app.run(host='0.0.0.0', port=5000)